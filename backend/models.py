@@ -1,9 +1,13 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
 import uuid
 
+class _Base(BaseModel):
+    """Shared config: accept both field names and camelCase aliases"""
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
+
 class SensorType(str, Enum):
     TEMPERATURE = "temperature"
     HUMIDITY = "humidity"
@@ -23,9 +27,10 @@ class LogStatus(str, Enum):
     WARNING = "warning"
     ERROR = "error"
 
-class WeatherData(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+class WeatherDataRead(_Base):
+    """Stored weather record; id and timestamp come from the database"""
+    id: str
+    timestamp: datetime
     temperature: float
     humidity: float
     air_quality: int = Field(alias="airQuality")
@@ -39,11 +44,12 @@ class WeatherData(BaseModel):
     visibility: Optional[float] = None
     raw_data: Optional[Dict[str, Any]] = Field(alias="rawData", default=None)
     location: Optional[str] = None
-    
-    class Config:
-        validate_by_name = True
 
-class WeatherDataCreate(BaseModel):
+class WeatherData(WeatherDataRead):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class WeatherDataCreate(_Base):
     temperature: float
     humidity: float
     air_quality: int = Field(alias="airQuality")
@@ -56,11 +62,8 @@ class WeatherDataCreate(BaseModel):
     uv_index: Optional[int] = Field(alias="uvIndex", default=None)
     visibility: Optional[float] = None
     location: Optional[str] = None
-    
-    class Config:
-        validate_by_name = True
 
-class Anomaly(BaseModel):
+class Anomaly(_Base):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     sensor_type: SensorType = Field(alias="sensorType")
@@ -69,22 +72,16 @@ class Anomaly(BaseModel):
     reason: str
     status: AnomalyStatus
     confidence: Optional[float] = None
-    
-    class Config:
-        validate_by_name = True
 
-class AnomalyCreate(BaseModel):
+class AnomalyCreate(_Base):
     sensor_type: SensorType = Field(alias="sensorType")
     original_value: float = Field(alias="originalValue")
     filtered_value: Optional[float] = Field(alias="filteredValue", default=None)
     reason: str
     status: AnomalyStatus
     confidence: Optional[float] = None
-    
-    class Config:
-        validate_by_name = True
 
-class ProcessingLog(BaseModel):
+class ProcessingLog(_Base):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     action: str
@@ -92,39 +89,33 @@ class ProcessingLog(BaseModel):
     details: str
     duration_ms: Optional[int] = Field(alias="durationMs", default=None)
     data_count: Optional[int] = Field(alias="dataCount", default=None)
-    
-    class Config:
-        validate_by_name = True
 
-class ProcessingLogCreate(BaseModel):
+class ProcessingLogCreate(_Base):
     action: str
     status: LogStatus
     details: str
     duration_ms: Optional[int] = Field(alias="durationMs", default=None)
     data_count: Optional[int] = Field(alias="dataCount", default=None)
-    
-    class Config:
-        validate_by_name = True
 
-class DataFilter(BaseModel):
+class DataFilter(_Base):
+    # Request-only model: build the validator on first use, not at import
+    model_config = ConfigDict(defer_build=True)
+    
     start_date: Optional[datetime] = Field(alias="startDate", default=None)
     end_date: Optional[datetime] = Field(alias="endDate", default=None)
     limit: Optional[int] = 100
     sensor_types: Optional[List[SensorType]] = Field(alias="sensorTypes", default=None)
-    
-    class Config:
-        validate_by_name = True
 
-class ExportRequest(BaseModel):
+class ExportRequest(_Base):
+    # Request-only model: build the validator on first use, not at import
+    model_config = ConfigDict(defer_build=True)
+    
     data_type: str = Field(alias="dataType")  # "hourly", "daily", "anomalies"
     start_date: Optional[datetime] = Field(alias="startDate", default=None)
     end_date: Optional[datetime] = Field(alias="endDate", default=None)
     format: str = "csv"
-    
-    class Config:
-        validate_by_name = True
 
-class DailyStats(BaseModel):
+class DailyStats(_Base):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     date: str  # YYYY-MM-DD format
     avg_temperature: float = Field(alias="avgTemperature")
@@ -136,11 +127,8 @@ class DailyStats(BaseModel):
     data_points_count: int = Field(alias="dataPointsCount")
     anomalies_count: int = Field(alias="anomaliesCount")
     created_at: datetime = Field(default_factory=datetime.utcnow, alias="createdAt")
-    
-    class Config:
-        validate_by_name = True
 
-class CurrentConditions(BaseModel):
+class CurrentConditions(_Base):
     temperature: float
     humidity: float
     air_quality: int = Field(alias="airQuality")
@@ -154,6 +142,3 @@ class CurrentConditions(BaseModel):
     visibility: Optional[float] = None
     last_updated: datetime = Field(alias="lastUpdated")
     location: Optional[str] = None
-    
-    class Config:
-        validate_by_name = True
@@ -1,20 +1,22 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Response, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, BackgroundTasks
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 import asyncio
+import time
 from io import StringIO
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 # Import models and services
 try:
     from models import (
-        WeatherData, WeatherDataCreate, CurrentConditions, DailyStats,
+        WeatherData, WeatherDataRead, WeatherDataCreate, CurrentConditions, DailyStats,
         Anomaly, ProcessingLog, DataFilter, ExportRequest
     )
     from services.weather_service import weather_service
@@ -27,7 +29,7 @@ except ImportError:
     sys.path.append(os.path.dirname(__file__))
     
     from models import (
-        WeatherData, WeatherDataCreate, CurrentConditions, DailyStats,
+        WeatherData, WeatherDataRead, WeatherDataCreate, CurrentConditions, DailyStats,
         Anomaly, ProcessingLog, DataFilter, ExportRequest
     )
     from services.weather_service import weather_service
@@ -39,14 +41,23 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=50,
+    minPoolSize=10,
+    compressors="zstd"
+)
 db = client[os.environ['DB_NAME']]
 
 # Initialize data processor
 data_processor = DataProcessor(db)
 
 # Create the main app without a prefix
-app = FastAPI(title="Air Quality Monitor API", version="1.0.0")
+app = FastAPI(
+    title="Air Quality Monitor API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse
+)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -58,13 +69,85 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _response_aliases(model) -> Tuple[Tuple[str, str], ...]:
+    """(field name, JSON key) pairs a response model serializes to"""
+    return tuple((name, field.alias or name) for name, field in model.model_fields.items())
+
+def _mongo_projection(aliases: Tuple[Tuple[str, str], ...]) -> Dict[str, int]:
+    """Projection that fetches only the stored fields a response needs"""
+    return {"_id": 0, **{name: 1 for name, _ in aliases}}
+
+# Raw upstream payloads stay in the database; list endpoints never return them
+_WEATHER_ALIASES = tuple(pair for pair in _response_aliases(WeatherDataRead) if pair[0] != "raw_data")
+_DAILY_ALIASES = _response_aliases(DailyStats)
+_ANOMALY_ALIASES = _response_aliases(Anomaly)
+_LOG_ALIASES = _response_aliases(ProcessingLog)
+
+_WEATHER_PROJECTION = _mongo_projection(_WEATHER_ALIASES)
+_DAILY_PROJECTION = _mongo_projection(_DAILY_ALIASES)
+_ANOMALY_PROJECTION = _mongo_projection(_ANOMALY_ALIASES)
+_LOG_PROJECTION = _mongo_projection(_LOG_ALIASES)
+
+def _project(doc: Dict[str, Any], aliases: Tuple[Tuple[str, str], ...]) -> Dict[str, Any]:
+    """Shape a stored document like its response model without re-validating it"""
+    return {alias: doc.get(name) for name, alias in aliases}
+
+class RequestTimeMiddleware:
+    """Stamp each HTTP request with a single utcnow() shared by its handler"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["now"] = datetime.utcnow()
+        await self.app(scope, receive, send)
+
+def _iso_date(d: datetime) -> str:
+    """YYYY-MM-DD without going through strftime"""
+    return f"{d.year:04d}-{d.month:02d}-{d.day:02d}"
+
+# Assembled /current payloads per location: (monotonic time, JSON-ready dict)
+CURRENT_CACHE_TTL = 30  # seconds
+_current_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+def _current_payload(latest_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the CurrentConditions response body from a stored weather record"""
+    current_conditions = CurrentConditions(
+        temperature=latest_data.get('temperature', 0),
+        humidity=latest_data.get('humidity', 0),
+        airQuality=latest_data.get('air_quality', 0),
+        pm25=latest_data.get('pm25'),
+        pm10=latest_data.get('pm10'),
+        co2=latest_data.get('co2'),
+        pressure=latest_data.get('pressure', 1013),
+        windSpeed=latest_data.get('wind_speed', 0),
+        windDirection=latest_data.get('wind_direction', 0),
+        uvIndex=latest_data.get('uv_index'),
+        visibility=latest_data.get('visibility'),
+        lastUpdated=latest_data.get('timestamp', datetime.utcnow()),
+        location=latest_data.get('location', 'Kyiv, Ukraine')
+    )
+    return current_conditions.model_dump(by_alias=True, mode="json")
+
+def publish_new_current(weather_data: WeatherData, location: str = "Kyiv"):
+    """Replace the cached /current payload after a new record has been stored"""
+    _current_cache[location] = (time.monotonic(), _current_payload(weather_data.model_dump()))
+
+async def collect_and_publish(location: str = "Kyiv") -> Optional[WeatherData]:
+    """Run one processing cycle and publish its result to the /current cache"""
+    result = await data_processor.process_weather_data(location)
+    if result:
+        publish_new_current(result)
+    return result
+
 # Background task for continuous data collection
 async def continuous_data_collection():
     """Background task to collect data every hour"""
     while True:
         try:
             logger.info("Starting scheduled data collection...")
-            result = await data_processor.process_weather_data("Kyiv")
+            result = await collect_and_publish("Kyiv")
             if result:
                 logger.info(f"Successfully processed weather data: {result.id}")
             else:
@@ -78,25 +161,43 @@ async def continuous_data_collection():
 # Start background task on startup
 @app.on_event("startup")
 async def startup_event():
-    # Start background data collection
+    # Indexes backing the time-range reads and sorts, and the per-day stats upsert
+    try:
+        await asyncio.gather(
+            db.weather_data.create_index([("timestamp", -1)]),
+            db.anomalies.create_index([("timestamp", -1)]),
+            db.daily_stats.create_index("date", unique=True)
+        )
+    except Exception as e:
+        logger.error(f"Error creating indexes: {str(e)}")
+    
+    # Start buffered log writes and background data collection
+    data_processor.start_log_flusher()
     asyncio.create_task(continuous_data_collection())
     logger.info("Started continuous data collection background task")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await data_processor.stop_log_flusher()
     await weather_service.close()
     client.close()
 
 # API Routes
+# Read endpoints return ORJSONResponse bodies built from trusted documents;
+# their models are advertised through `responses` and never re-validated.
 
 @api_router.get("/")
 async def root():
     return {"message": "Air Quality Monitor API", "status": "active", "version": "1.0.0"}
 
-@api_router.get("/current", response_model=CurrentConditions)
+@api_router.get("/current", response_model=None, responses={200: {"model": CurrentConditions}})
 async def get_current_conditions():
     """Get current weather and air quality conditions"""
     try:
+        cached = _current_cache.get("Kyiv")
+        if cached and time.monotonic() - cached[0] < CURRENT_CACHE_TTL:
+            return ORJSONResponse(content=cached[1])
+        
         # Get the most recent data from database
         latest_data = await db.weather_data.find_one(
             {},
@@ -109,102 +210,94 @@ async def get_current_conditions():
             result = await data_processor.process_weather_data("Kyiv")
             if not result:
                 raise HTTPException(status_code=503, detail="Unable to fetch weather data")
-            latest_data = result.dict()
+            latest_data = result.model_dump()
         
         # Transform to CurrentConditions format
-        current_conditions = CurrentConditions(
-            temperature=latest_data.get('temperature', 0),
-            humidity=latest_data.get('humidity', 0),
-            airQuality=latest_data.get('air_quality', 0),
-            pm25=latest_data.get('pm25'),
-            pm10=latest_data.get('pm10'),
-            co2=latest_data.get('co2'),
-            pressure=latest_data.get('pressure', 1013),
-            windSpeed=latest_data.get('wind_speed', 0),
-            windDirection=latest_data.get('wind_direction', 0),
-            uvIndex=latest_data.get('uv_index'),
-            visibility=latest_data.get('visibility'),
-            lastUpdated=latest_data.get('timestamp', datetime.utcnow()),
-            location=latest_data.get('location', 'Kyiv, Ukraine')
-        )
+        payload = _current_payload(latest_data)
+        _current_cache["Kyiv"] = (time.monotonic(), payload)
         
-        return current_conditions
+        return ORJSONResponse(content=payload)
         
     except Exception as e:
         logger.error(f"Error getting current conditions: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@api_router.get("/hourly", response_model=List[WeatherData])
-async def get_hourly_data(hours: int = 24, limit: int = 100):
+@api_router.get("/hourly", response_model=None, responses={200: {"model": List[WeatherDataRead]}})
+async def get_hourly_data(request: Request, hours: int = 24, limit: int = 100):
     """Get hourly weather data for the specified number of hours"""
     try:
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+        cutoff_time = request.state.now - timedelta(hours=hours)
         
-        cursor = db.weather_data.find(
-            {"timestamp": {"$gte": cutoff_time}},
-            sort=[("timestamp", -1)],
-            limit=limit
-        )
+        pipeline = [
+            {"$match": {"timestamp": {"$gte": cutoff_time}}},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": limit},
+            {"$project": _WEATHER_PROJECTION}
+        ]
+        cursor = db.weather_data.aggregate(pipeline, hint=[("timestamp", -1)])
         
         data = await cursor.to_list(limit)
-        return [WeatherData(**item) for item in data]
+        return ORJSONResponse([_project(item, _WEATHER_ALIASES) for item in data])
         
     except Exception as e:
         logger.error(f"Error getting hourly data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@api_router.get("/daily", response_model=List[DailyStats])
-async def get_daily_stats(days: int = 30):
+@api_router.get("/daily", response_model=None, responses={200: {"model": List[DailyStats]}})
+async def get_daily_stats(request: Request, days: int = 30):
     """Get daily statistics for the specified number of days"""
     try:
-        cutoff_date = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+        cutoff_date = _iso_date(request.state.now - timedelta(days=days))
         
         cursor = db.daily_stats.find(
             {"date": {"$gte": cutoff_date}},
+            _DAILY_PROJECTION,
             sort=[("date", -1)],
             limit=days
         )
         
         data = await cursor.to_list(days)
-        return [DailyStats(**item) for item in data]
+        return ORJSONResponse([_project(item, _DAILY_ALIASES) for item in data])
         
     except Exception as e:
         logger.error(f"Error getting daily stats: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@api_router.get("/anomalies", response_model=List[Anomaly])
-async def get_anomalies(hours: int = 24, limit: int = 100):
+@api_router.get("/anomalies", response_model=None, responses={200: {"model": List[Anomaly]}})
+async def get_anomalies(request: Request, hours: int = 24, limit: int = 100):
     """Get detected anomalies for the specified time period"""
     try:
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+        cutoff_time = request.state.now - timedelta(hours=hours)
         
         cursor = db.anomalies.find(
             {"timestamp": {"$gte": cutoff_time}},
+            _ANOMALY_PROJECTION,
             sort=[("timestamp", -1)],
             limit=limit
         )
         
         data = await cursor.to_list(limit)
-        return [Anomaly(**item) for item in data]
+        return ORJSONResponse([_project(item, _ANOMALY_ALIASES) for item in data])
         
     except Exception as e:
         logger.error(f"Error getting anomalies: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@api_router.get("/logs", response_model=List[ProcessingLog])
-async def get_processing_logs(hours: int = 24, limit: int = 50):
+@api_router.get("/logs", response_model=None, responses={200: {"model": List[ProcessingLog]}})
+async def get_processing_logs(request: Request, hours: int = 24, limit: int = 50):
     """Get processing logs for the specified time period"""
     try:
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+        cutoff_time = request.state.now - timedelta(hours=hours)
         
         cursor = db.processing_logs.find(
             {"timestamp": {"$gte": cutoff_time}},
+            _LOG_PROJECTION,
             sort=[("timestamp", -1)],
             limit=limit
         )
         
         data = await cursor.to_list(limit)
-        return [ProcessingLog(**item) for item in data]
+        return ORJSONResponse([_project(item, _LOG_ALIASES) for item in data])
         
     except Exception as e:
         logger.error(f"Error getting processing logs: {str(e)}")
@@ -215,7 +308,7 @@ async def trigger_data_collection(background_tasks: BackgroundTasks, location: s
     """Manually trigger data collection"""
     try:
         # Run data collection in background
-        background_tasks.add_task(data_processor.process_weather_data, location)
+        background_tasks.add_task(collect_and_publish, location)
         
         return {
             "message": "Data collection triggered",
@@ -231,22 +324,26 @@ async def trigger_data_collection(background_tasks: BackgroundTasks, location: s
 async def export_data(export_request: ExportRequest):
     """Export data in CSV format"""
     try:
-        csv_data = await data_processor.export_to_csv(
+        chunks = data_processor.iter_csv(
             export_request.data_type,
             export_request.start_date,
             export_request.end_date
         )
         
-        if not csv_data:
+        # Pull the first chunk up front so empty exports still get a 404
+        first_chunk = await anext(chunks, None)
+        if first_chunk is None:
             raise HTTPException(status_code=404, detail="No data found for the specified criteria")
         
         # Generate filename
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
         filename = f"{export_request.data_type}_data_{timestamp}.csv"
         
-        # Return CSV as streaming response
-        def generate_csv():
-            yield csv_data
+        # Stream the rest of the CSV as the cursor is read
+        async def generate_csv():
+            yield first_chunk
+            async for chunk in chunks:
+                yield chunk
         
         return StreamingResponse(
             generate_csv(),
@@ -254,6 +351,8 @@ async def export_data(export_request: ExportRequest):
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error exporting data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -262,22 +361,27 @@ async def export_data(export_request: ExportRequest):
 async def health_check():
     """Health check endpoint"""
     try:
-        # Check database connection
-        await db.command("ping")
+        # Database ping, last data collection and Weather API are independent checks
+        ping_result, latest_data, test_data = await asyncio.gather(
+            db.command("ping"),
+            db.weather_data.find_one({}, sort=[("timestamp", -1)]),
+            weather_service.get_current_weather("Kyiv", probe=True),
+            return_exceptions=True
+        )
+        
+        # Database failures make the service unhealthy
+        for result in (ping_result, latest_data):
+            if isinstance(result, Exception):
+                raise result
         
-        # Check last data collection
-        latest_data = await db.weather_data.find_one({}, sort=[("timestamp", -1)])
         last_collection = None
         if latest_data:
             last_collection = latest_data.get('timestamp')
         
-        # Check Weather API
-        weather_status = "unknown"
-        try:
-            test_data = await weather_service.get_current_weather("Kyiv")
-            weather_status = "connected" if test_data else "error"
-        except:
+        if isinstance(test_data, Exception):
             weather_status = "error"
+        else:
+            weather_status = "connected" if test_data else "error"
         
         return {
             "status": "healthy",
@@ -303,6 +407,11 @@ async def health_check():
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(RequestTimeMiddleware)
+
+# JSON arrays and CSV exports compress well; tiny bodies aren't worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -0,0 +1,56 @@
+# cython: language_level=3
+"""
+Compiled statistics kernels for the anomaly detector
+Build in place with: python setup.py build_ext --inplace (see requirements-build.txt)
+"""
+import numpy as np
+cimport cython
+from libc.math cimport sqrt, isnan, NAN
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef inline Py_ssize_t _welford(double[:, ::1] values, Py_ssize_t j, double* mean_out, double* m2_out) noexcept nogil:
+    """Single-pass running mean and sum of squared deviations of column j, skipping NaN"""
+    cdef Py_ssize_t i, count = 0
+    cdef double x, d, mean_val = 0.0, m2 = 0.0
+
+    for i in range(values.shape[0]):
+        x = values[i, j]
+        if isnan(x):
+            continue
+        count += 1
+        d = x - mean_val
+        mean_val += d / count
+        m2 += d * (x - mean_val)
+
+    mean_out[0] = mean_val
+    m2_out[0] = m2
+    return count
+
+
+def column_stats(double[:, ::1] values):
+    """
+    Per-column mean, sample standard deviation and count of non-NaN values
+    Columns without readings get NaN mean/std and zero count
+    """
+    cdef Py_ssize_t m = values.shape[1]
+    cdef Py_ssize_t j, count
+    cdef double mean_val, m2
+
+    means = np.empty(m, dtype=np.float64)
+    stds = np.empty(m, dtype=np.float64)
+    counts = np.empty(m, dtype=np.intp)
+    cdef double[::1] mean_view = means
+    cdef double[::1] std_view = stds
+    cdef Py_ssize_t[::1] count_view = counts
+
+    with nogil:
+        for j in range(m):
+            count = _welford(values, j, &mean_val, &m2)
+            count_view[j] = count
+            mean_view[j] = mean_val if count > 0 else NAN
+            std_view[j] = sqrt(m2 / (count - 1)) if count > 1 else NAN
+
+    return means, stds, counts
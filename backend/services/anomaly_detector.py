@@ -1,11 +1,43 @@
 import logging
 from typing import List, Dict, Any, Tuple, Optional
 from datetime import datetime, timedelta
-import statistics
+import numpy as np
 from models import WeatherData, Anomaly, AnomalyCreate, SensorType, AnomalyStatus
 
 logger = logging.getLogger(__name__)
 
+# Column order of the sensor matrix used for vectorized statistics
+SENSOR_ORDER = (
+    SensorType.TEMPERATURE,
+    SensorType.HUMIDITY,
+    SensorType.AIR_QUALITY,
+    SensorType.PRESSURE,
+    SensorType.PM25,
+    SensorType.PM10,
+    SensorType.CO2
+)
+
+# WeatherData attribute holding each sensor, aligned with SENSOR_ORDER
+SENSOR_FIELDS = ('temperature', 'humidity', 'air_quality', 'pressure', 'pm25', 'pm10', 'co2')
+
+def _column_stats_numpy(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-column mean, sample standard deviation and count of non-NaN values"""
+    valid = ~np.isnan(values)
+    counts = np.count_nonzero(valid, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(valid, values, 0.0).sum(axis=0) / counts
+        squares = np.where(valid, values - means, 0.0) ** 2
+        stds = np.sqrt(squares.sum(axis=0) / (counts - 1))
+    # Like the kernel: no spread without at least two readings (an empty column would give -0.0)
+    stds[counts < 2] = np.nan
+    return means, stds, counts
+
+try:
+    from services._anomaly_fast import column_stats
+except ImportError:
+    # Pure NumPy fallback when the compiled kernel is not built
+    column_stats = _column_stats_numpy
+
 class AnomalyDetector:
     """
     Simple anomaly detection service for weather data
@@ -31,10 +63,18 @@ class AnomalyDetector:
             SensorType.AIR_QUALITY: 100,    # AQI per hour
             SensorType.PRESSURE: 15.0       # hPa per hour
         }
+        
+        # Flattened (sensor, attribute, min, max, unit) rows and unit lookup for the hot loops
+        self._ranges_tuple = tuple(
+            (sensor_type, field, self.SENSOR_RANGES[sensor_type]['min'], self.SENSOR_RANGES[sensor_type]['max'], self.SENSOR_RANGES[sensor_type]['unit'])
+            for sensor_type, field in zip(SENSOR_ORDER, SENSOR_FIELDS)
+        )
+        self._unit_by_sensor = {sensor_type: r['unit'] for sensor_type, r in self.SENSOR_RANGES.items()}
     
-    async def detect_anomalies(self, current_data: WeatherData, historical_data: List[WeatherData]) -> List[AnomalyCreate]:
+    async def detect_anomalies(self, current_data: WeatherData, historical_data: List[Dict[str, Any]]) -> List[AnomalyCreate]:
         """
         Detect anomalies in current data compared to historical patterns
+        Historical records are stored documents keyed by WeatherData field name
         """
         anomalies = []
         
@@ -64,149 +104,96 @@ class AnomalyDetector:
         """Check if values are within acceptable ranges"""
         anomalies = []
         
-        sensor_values = {
-            SensorType.TEMPERATURE: data.temperature,
-            SensorType.HUMIDITY: data.humidity,
-            SensorType.AIR_QUALITY: data.air_quality,
-            SensorType.PRESSURE: data.pressure
-        }
-        
-        if data.pm25 is not None:
-            sensor_values[SensorType.PM25] = data.pm25
-        if data.pm10 is not None:
-            sensor_values[SensorType.PM10] = data.pm10
-        if data.co2 is not None:
-            sensor_values[SensorType.CO2] = data.co2
-        
-        for sensor_type, value in sensor_values.items():
-            if value is None:
-                continue
-                
-            sensor_range = self.SENSOR_RANGES.get(sensor_type)
-            if not sensor_range:
+        for sensor_type, field, min_val, max_val, unit in self._ranges_tuple:
+            value = getattr(data, field)
+            if value is None or min_val <= value <= max_val:
                 continue
             
-            if value < sensor_range['min']:
+            if value < min_val:
                 anomalies.append(AnomalyCreate(
                     sensorType=sensor_type,
                     originalValue=value,
-                    reason=f"Значення {value} {sensor_range['unit']} нижче мінімального порогу {sensor_range['min']} {sensor_range['unit']}",
+                    reason=f"Значення {value} {unit} нижче мінімального порогу {min_val} {unit}",
                     status=AnomalyStatus.DETECTED,
                     confidence=1.0
                 ))
-            elif value > sensor_range['max']:
+            else:
                 anomalies.append(AnomalyCreate(
                     sensorType=sensor_type,
                     originalValue=value,
-                    reason=f"Значення {value} {sensor_range['unit']} вище максимального порогу {sensor_range['max']} {sensor_range['unit']}",
+                    reason=f"Значення {value} {unit} вище максимального порогу {max_val} {unit}",
                     status=AnomalyStatus.DETECTED,
                     confidence=1.0
                 ))
         
         return anomalies
     
-    def _check_statistical_anomalies(self, current_data: WeatherData, historical_data: List[WeatherData]) -> List[AnomalyCreate]:
+    def _check_statistical_anomalies(self, current_data: WeatherData, historical_data: List[Dict[str, Any]]) -> List[AnomalyCreate]:
         """Check for statistical outliers using Z-score"""
         anomalies = []
         
-        # Prepare historical values for different sensors
-        historical_values = {
-            SensorType.TEMPERATURE: [d.temperature for d in historical_data if d.temperature is not None],
-            SensorType.HUMIDITY: [d.humidity for d in historical_data if d.humidity is not None],
-            SensorType.AIR_QUALITY: [d.air_quality for d in historical_data if d.air_quality is not None],
-            SensorType.PRESSURE: [d.pressure for d in historical_data if d.pressure is not None]
-        }
-        
-        # Add PM data if available
-        pm25_values = [d.pm25 for d in historical_data if d.pm25 is not None]
-        if pm25_values:
-            historical_values[SensorType.PM25] = pm25_values
-            
-        pm10_values = [d.pm10 for d in historical_data if d.pm10 is not None]
-        if pm10_values:
-            historical_values[SensorType.PM10] = pm10_values
-            
-        co2_values = [d.co2 for d in historical_data if d.co2 is not None]
-        if co2_values:
-            historical_values[SensorType.CO2] = co2_values
+        # Historical values as one (n, sensors) matrix, missing readings as NaN
+        hist = np.empty((len(historical_data), len(SENSOR_ORDER)), dtype=np.float64)
+        for row, d in enumerate(historical_data):
+            hist[row] = [d.get(field) for field in SENSOR_FIELDS]
         
         # Current values
-        current_values = {
-            SensorType.TEMPERATURE: current_data.temperature,
-            SensorType.HUMIDITY: current_data.humidity,
-            SensorType.AIR_QUALITY: current_data.air_quality,
-            SensorType.PRESSURE: current_data.pressure
-        }
-        
-        if current_data.pm25 is not None:
-            current_values[SensorType.PM25] = current_data.pm25
-        if current_data.pm10 is not None:
-            current_values[SensorType.PM10] = current_data.pm10
-        if current_data.co2 is not None:
-            current_values[SensorType.CO2] = current_data.co2
+        current = np.array([getattr(current_data, field) for field in SENSOR_FIELDS], dtype=np.float64)
         
-        # Calculate Z-scores and detect anomalies
-        for sensor_type, current_value in current_values.items():
-            if current_value is None or sensor_type not in historical_values:
-                continue
-                
-            hist_values = historical_values[sensor_type]
-            if len(hist_values) < 10:  # Need minimum samples for statistical analysis
-                continue
+        try:
+            mean_vals, std_vals, counts = column_stats(hist)
             
-            try:
-                mean_val = statistics.mean(hist_values)
-                std_val = statistics.stdev(hist_values)
-                
-                if std_val == 0:  # Avoid division by zero
-                    continue
+            # Need minimum samples for statistical analysis
+            eligible = (counts >= 10) & ~np.isnan(current)
+            
+            # Avoid division by zero: constant series never produce outliers
+            z_scores = np.zeros_like(mean_vals)
+            np.divide(np.abs(current - mean_vals), std_vals, out=z_scores, where=eligible & (std_vals > 0))
+            
+            mask = z_scores > self.z_score_threshold
+            for i in np.flatnonzero(mask):
+                sensor_type = SENSOR_ORDER[i]
+                z_score = float(z_scores[i])
+                unit = self._unit_by_sensor.get(sensor_type, '')
                 
-                z_score = abs(current_value - mean_val) / std_val
+                anomalies.append(AnomalyCreate(
+                    sensorType=sensor_type,
+                    originalValue=getattr(current_data, SENSOR_FIELDS[i]),
+                    reason=f"Статистичне відхилення: Z-score {z_score:.2f} (середнє: {mean_vals[i]:.1f} {unit})",
+                    status=AnomalyStatus.DETECTED,
+                    confidence=min(1.0, z_score / 5.0)  # Scale confidence based on Z-score
+                ))
                 
-                if z_score > self.z_score_threshold:
-                    sensor_range = self.SENSOR_RANGES.get(sensor_type, {})
-                    unit = sensor_range.get('unit', '')
-                    
-                    anomalies.append(AnomalyCreate(
-                        sensorType=sensor_type,
-                        originalValue=current_value,
-                        reason=f"Статистичне відхилення: Z-score {z_score:.2f} (середнє: {mean_val:.1f} {unit})",
-                        status=AnomalyStatus.DETECTED,
-                        confidence=min(1.0, z_score / 5.0)  # Scale confidence based on Z-score
-                    ))
-                    
-            except Exception as e:
-                logger.error(f"Error calculating Z-score for {sensor_type}: {str(e)}")
-                continue
+        except Exception as e:
+            logger.error(f"Error calculating Z-scores: {str(e)}")
         
         return anomalies
     
-    def _check_rapid_changes(self, current_data: WeatherData, previous_data: WeatherData) -> List[AnomalyCreate]:
+    def _check_rapid_changes(self, current_data: WeatherData, previous_data: Dict[str, Any]) -> List[AnomalyCreate]:
         """Check for rapid changes between consecutive readings"""
         anomalies = []
         
         # Calculate time difference (assume 1 hour if timestamps are equal)
-        time_diff = (current_data.timestamp - previous_data.timestamp).total_seconds() / 3600
+        time_diff = (current_data.timestamp - previous_data['timestamp']).total_seconds() / 3600
         if time_diff <= 0:
             time_diff = 1.0  # Default to 1 hour
         
-        # Check rapid changes for different sensors
+        # Rate of change and current value for different sensors
         changes = {
-            SensorType.TEMPERATURE: abs(current_data.temperature - previous_data.temperature) / time_diff,
-            SensorType.HUMIDITY: abs(current_data.humidity - previous_data.humidity) / time_diff,
-            SensorType.AIR_QUALITY: abs(current_data.air_quality - previous_data.air_quality) / time_diff,
-            SensorType.PRESSURE: abs(current_data.pressure - previous_data.pressure) / time_diff
+            SensorType.TEMPERATURE: (abs(current_data.temperature - previous_data['temperature']) / time_diff, current_data.temperature),
+            SensorType.HUMIDITY: (abs(current_data.humidity - previous_data['humidity']) / time_diff, current_data.humidity),
+            SensorType.AIR_QUALITY: (abs(current_data.air_quality - previous_data['air_quality']) / time_diff, current_data.air_quality),
+            SensorType.PRESSURE: (abs(current_data.pressure - previous_data['pressure']) / time_diff, current_data.pressure)
         }
         
-        for sensor_type, rate_of_change in changes.items():
+        for sensor_type, (rate_of_change, current_value) in changes.items():
             threshold = self.rapid_change_threshold.get(sensor_type)
             if threshold and rate_of_change > threshold:
-                sensor_range = self.SENSOR_RANGES.get(sensor_type, {})
-                unit = sensor_range.get('unit', '')
+                unit = self._unit_by_sensor.get(sensor_type, '')
                 
                 anomalies.append(AnomalyCreate(
                     sensorType=sensor_type,
-                    originalValue=getattr(current_data, sensor_type.value),
+                    originalValue=current_value,
                     reason=f"Різка зміна показника: {rate_of_change:.1f} {unit}/год (поріг: {threshold} {unit}/год)",
                     status=AnomalyStatus.DETECTED,
                     confidence=min(1.0, rate_of_change / (threshold * 2))
@@ -214,7 +201,7 @@ class AnomalyDetector:
         
         return anomalies
     
-    def filter_anomalous_value(self, original_value: float, sensor_type: SensorType, historical_data: List[float]) -> Tuple[float, str]:
+    def filter_anomalous_value(self, original_value: float, sensor_type: SensorType, historical_data: np.ndarray) -> Tuple[float, str]:
         """
         Apply filtering to anomalous values
         Returns filtered value and reason for filtering
@@ -234,12 +221,18 @@ class AnomalyDetector:
             
             # If we have historical data, use median filtering for statistical outliers
             if len(historical_data) >= 5:
-                median_value = statistics.median(historical_data)
-                mean_value = statistics.mean(historical_data)
+                arr = np.asarray(historical_data, dtype=np.float64)
+                mean_value = arr.mean()
+                std_dev = arr.std(ddof=1) if arr.size > 1 else 0.0
                 
                 # Use median if the original value is too far from historical patterns
-                std_dev = statistics.stdev(historical_data) if len(historical_data) > 1 else 0
                 if std_dev > 0 and abs(original_value - mean_value) > 3 * std_dev:
+                    mid = arr.size // 2
+                    if arr.size % 2:
+                        median_value = float(np.partition(arr, mid)[mid])
+                    else:
+                        part = np.partition(arr, (mid - 1, mid))
+                        median_value = float((part[mid - 1] + part[mid]) / 2)
                     return median_value, f"Замінено медіанним значенням через статистичне відхилення"
             
             return original_value, "Значення в межах норми"
@@ -1,26 +1,132 @@
 import logging
+import asyncio
 import csv
 import io
-from typing import List, Dict, Any, Optional
+import time
+import uuid
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+import numpy as np
+import orjson
+import zstandard
+from bson import Binary
 from motor.motor_asyncio import AsyncIOMotorCollection
-from models import WeatherData, WeatherDataCreate, Anomaly, ProcessingLog, ProcessingLogCreate, LogStatus, DailyStats
-from services.anomaly_detector import anomaly_detector
+from pymongo import WriteConcern
+from pymongo.errors import OperationFailure
+from models import WeatherData, WeatherDataCreate, Anomaly, DailyStats, LogStatus
+from services.anomaly_detector import anomaly_detector, SENSOR_ORDER, SENSOR_FIELDS
 from services.weather_service import weather_service
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on documents per insert_many call, well below the 16MB BSON limit
+MAX_INSERT_BATCH = 1000
+
+# Buffered processing logs are flushed at this size or interval, whichever comes first
+LOG_FLUSH_SIZE = 32
+LOG_FLUSH_INTERVAL = 2.0  # seconds
+
+# Daily stats are re-materialized every this many processing cycles
+# (every 30 minutes at the 5-minute collection interval)
+DAILY_STATS_REFRESH_CYCLES = 6
+
+# Seconds a historical-data read is reused before querying the database again
+HISTORICAL_CACHE_TTL = 30
+
+# Rows fetched per cursor batch and written per streamed CSV chunk
+CSV_BATCH_SIZE = 500
+
+# Sensors stored as integers; every other sensor field is a float
+_INT_SENSOR_FIELDS = frozenset({'air_quality', 'co2'})
+
+# WeatherData attribute and type for each sensor, keyed by SensorType value.
+# Built from the detector's field table so both modules share one sensor mapping.
+_SENSOR_ATTR = {
+    sensor_type.value: (field, int if field in _INT_SENSOR_FIELDS else float)
+    for sensor_type, field in zip(SENSOR_ORDER, SENSOR_FIELDS)
+}
+
+# Fields the anomaly detector reads from stored readings
+_HISTORY_PROJECTION = {
+    "_id": 0, "timestamp": 1, "temperature": 1, "humidity": 1, "air_quality": 1,
+    "pressure": 1, "pm25": 1, "pm10": 1, "co2": 1
+}
+
+# Raw API payloads are stored as zstd-compressed JSON; decode with
+# orjson.loads(zstandard.ZstdDecompressor().decompress(doc["raw_data"]))
+_RAW_COMPRESSOR = zstandard.ZstdCompressor(level=3)
+
+def _bson_doc(model) -> Dict[str, Any]:
+    """Model fields as a fresh document without a serializer pass; None fields are left out"""
+    return {k: v for k, v in model.__dict__.items() if v is not None}
+
+def _weather_doc(weather_data: WeatherData) -> Dict[str, Any]:
+    """Weather document with the raw API payload packed into a single binary field"""
+    doc = _bson_doc(weather_data)
+    if "raw_data" in doc:
+        doc["raw_data"] = Binary(_RAW_COMPRESSOR.compress(orjson.dumps(doc["raw_data"])))
+    return doc
+
 class DataProcessor:
     """
     Service for processing weather data, detecting anomalies, and managing data flow
     """
     
+    # CSV export headers
+    HOURLY_CSV_HEADER = [
+        'Час', 'Температура (°C)', 'Вологість (%)', 'Якість повітря',
+        'PM2.5 (μg/m³)', 'PM10 (μg/m³)', 'CO2 (ppm)', 'Тиск (hPa)',
+        'Швидкість вітру (м/с)', 'Напрямок вітру (°)', 'Локація'
+    ]
+    
+    DAILY_CSV_HEADER = [
+        'Дата', 'Середня температура (°C)', 'Мін. температура (°C)', 'Макс. температура (°C)',
+        'Середня вологість (%)', 'Середня якість повітря', 'Середній тиск (hPa)',
+        'Кількість записів', 'Кількість аномалій'
+    ]
+    
+    ANOMALIES_CSV_HEADER = [
+        'ID', 'Час', 'Тип сенсора', 'Оригінальне значення', 'Відфільтроване значення',
+        'Причина', 'Статус', 'Достовірність'
+    ]
+    
+    # Stored fields read by each CSV row builder; everything else stays in the database
+    HOURLY_CSV_PROJECTION = {
+        "_id": 0, "timestamp": 1, "temperature": 1, "humidity": 1, "air_quality": 1,
+        "pm25": 1, "pm10": 1, "co2": 1, "pressure": 1, "wind_speed": 1,
+        "wind_direction": 1, "location": 1
+    }
+    
+    DAILY_CSV_PROJECTION = {
+        "_id": 0, "date": 1, "avg_temperature": 1, "min_temperature": 1, "max_temperature": 1,
+        "avg_humidity": 1, "avg_air_quality": 1, "avg_pressure": 1,
+        "data_points_count": 1, "anomalies_count": 1
+    }
+    
+    ANOMALIES_CSV_PROJECTION = {
+        "_id": 0, "id": 1, "timestamp": 1, "sensor_type": 1, "original_value": 1,
+        "filtered_value": 1, "reason": 1, "status": 1, "confidence": 1
+    }
+    
     def __init__(self, db):
         self.db = db
         self.weather_collection: AsyncIOMotorCollection = db.weather_data
         self.anomaly_collection: AsyncIOMotorCollection = db.anomalies
         self.logs_collection: AsyncIOMotorCollection = db.processing_logs
         self.daily_stats_collection: AsyncIOMotorCollection = db.daily_stats
+        # Logs are non-critical: acknowledged by the primary but not waited on for the journal
+        self.logs_write_collection: AsyncIOMotorCollection = self.logs_collection.with_options(
+            write_concern=WriteConcern(w=1, j=False)
+        )
+        self._log_buffer: List[Dict[str, Any]] = []
+        self._log_lock = asyncio.Lock()
+        self._log_flush_tasks = set()
+        self._log_flusher: Optional[asyncio.Task] = None
+        # Recent historical reads by window in hours: (monotonic fetch time, records)
+        self._hist_cache: Dict[int, Tuple[float, List[Dict[str, Any]]]] = {}
+        # Dates with new readings since the last daily-stats refresh; the first cycle refreshes
+        self._stats_pending_dates = set()
+        self._cycles_since_stats = DAILY_STATS_REFRESH_CYCLES - 1
     
     async def process_weather_data(self, location: str = "Kyiv") -> Optional[WeatherData]:
         """
@@ -30,10 +136,13 @@ class DataProcessor:
         processing_steps = []
         
         try:
-            # Step 1: Fetch data from Weather API
+            # Step 1: Fetch data from Weather API while reading history for anomaly detection
             await self._log_action("Отримання даних з Weather API", LogStatus.SUCCESS, "Початок запиту до API")
             
-            raw_weather_data = await weather_service.get_current_weather(location)
+            raw_weather_data, historical_data = await asyncio.gather(
+                weather_service.get_current_weather(location),
+                self._get_recent_historical_data(hours=24)
+            )
             if not raw_weather_data:
                 await self._log_action("Отримання даних з Weather API", LogStatus.ERROR, "Не вдалося отримати дані з API")
                 return None
@@ -44,8 +153,7 @@ class DataProcessor:
             weather_data = WeatherData(**raw_weather_data)
             processing_steps.append("Дані структуровано")
             
-            # Step 3: Get historical data for anomaly detection
-            historical_data = await self._get_recent_historical_data(hours=24)
+            # Step 3: Historical data was fetched alongside the API request
             processing_steps.append(f"Отримано {len(historical_data)} історичних записів")
             
             # Step 4: Detect anomalies
@@ -56,18 +164,18 @@ class DataProcessor:
             filtered_data = await self._process_anomalies(weather_data, anomalies, historical_data)
             processing_steps.append("Аномалії оброблено")
             
-            # Step 6: Store processed data
-            await self._store_weather_data(filtered_data)
+            # Steps 6-7: Store processed data and anomalies concurrently
+            if anomalies:
+                await asyncio.gather(self._store_weather_data(filtered_data), self._store_anomalies(anomalies))
+            else:
+                await self._store_weather_data(filtered_data)
             processing_steps.append("Дані збережено в БД")
-            
-            # Step 7: Store anomalies
             if anomalies:
-                await self._store_anomalies(anomalies)
                 processing_steps.append(f"Збережено {len(anomalies)} аномалій")
             
-            # Step 8: Update daily statistics
-            await self._update_daily_stats(filtered_data.timestamp.date())
-            processing_steps.append("Статистику оновлено")
+            # Step 8: Refresh daily statistics periodically, once both writes are visible
+            if await self._refresh_daily_stats(filtered_data.timestamp.date()):
+                processing_steps.append("Статистику оновлено")
             
             # Log successful processing
             duration = (datetime.utcnow() - start_time).total_seconds() * 1000
@@ -92,50 +200,53 @@ class DataProcessor:
                 duration_ms=int(duration)
             )
             return None
+            
+        finally:
+            self._schedule_log_flush()
     
-    async def _get_recent_historical_data(self, hours: int = 24) -> List[WeatherData]:
-        """Get recent historical data for analysis"""
+    async def _get_recent_historical_data(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """Get recent historical data for analysis: timestamp and sensor readings only"""
+        cached = self._hist_cache.get(hours)
+        if cached and time.monotonic() - cached[0] < HISTORICAL_CACHE_TTL:
+            return cached[1]
+        
         try:
             cutoff_time = datetime.utcnow() - timedelta(hours=hours)
             cursor = self.weather_collection.find(
                 {"timestamp": {"$gte": cutoff_time}},
+                projection=_HISTORY_PROJECTION,
                 sort=[("timestamp", -1)],
                 limit=100
             )
             
-            data = await cursor.to_list(length=100)
-            return [WeatherData(**item) for item in data]
+            historical_data = await cursor.to_list(length=100)
+            self._hist_cache[hours] = (time.monotonic(), historical_data)
+            return historical_data
             
         except Exception as e:
             logger.error(f"Error fetching historical data: {str(e)}")
             return []
     
-    async def _process_anomalies(self, weather_data: WeatherData, anomalies: List[Any], historical_data: List[WeatherData]) -> WeatherData:
+    async def _process_anomalies(self, weather_data: WeatherData, anomalies: List[Any], historical_data: List[Dict[str, Any]]) -> WeatherData:
         """Process detected anomalies and apply filtering"""
         try:
             filtered_data = weather_data.copy()
             
+            # Historical readings per sensor as contiguous arrays, built once per cycle
+            hist_arrays: Dict[str, np.ndarray] = {}
+            
             for anomaly in anomalies:
                 sensor_type = anomaly.sensor_type
                 original_value = anomaly.original_value
+                attr, cast = _SENSOR_ATTR[sensor_type.value]
                 
-                # Get historical values for this sensor type
-                historical_values = []
-                for hist_data in historical_data:
-                    if sensor_type.value == "temperature":
-                        historical_values.append(hist_data.temperature)
-                    elif sensor_type.value == "humidity":
-                        historical_values.append(hist_data.humidity)
-                    elif sensor_type.value == "airQuality":
-                        historical_values.append(hist_data.air_quality)
-                    elif sensor_type.value == "pressure":
-                        historical_values.append(hist_data.pressure)
-                    elif sensor_type.value == "pm25" and hist_data.pm25 is not None:
-                        historical_values.append(hist_data.pm25)
-                    elif sensor_type.value == "pm10" and hist_data.pm10 is not None:
-                        historical_values.append(hist_data.pm10)
-                    elif sensor_type.value == "co2" and hist_data.co2 is not None:
-                        historical_values.append(hist_data.co2)
+                historical_values = hist_arrays.get(attr)
+                if historical_values is None:
+                    historical_values = np.fromiter(
+                        (v for v in (h.get(attr) for h in historical_data) if v is not None),
+                        dtype=np.float64
+                    )
+                    hist_arrays[attr] = historical_values
                 
                 # Filter the anomalous value
                 filtered_value, filter_reason = anomaly_detector.filter_anomalous_value(
@@ -143,20 +254,7 @@ class DataProcessor:
                 )
                 
                 # Apply the filtered value to the data
-                if sensor_type.value == "temperature":
-                    filtered_data.temperature = filtered_value
-                elif sensor_type.value == "humidity":
-                    filtered_data.humidity = filtered_value
-                elif sensor_type.value == "airQuality":
-                    filtered_data.air_quality = int(filtered_value)
-                elif sensor_type.value == "pressure":
-                    filtered_data.pressure = filtered_value
-                elif sensor_type.value == "pm25":
-                    filtered_data.pm25 = filtered_value
-                elif sensor_type.value == "pm10":
-                    filtered_data.pm10 = filtered_value
-                elif sensor_type.value == "co2":
-                    filtered_data.co2 = int(filtered_value)
+                setattr(filtered_data, attr, cast(filtered_value))
                 
                 # Update anomaly with filtered value and status
                 anomaly.filtered_value = filtered_value
@@ -172,8 +270,10 @@ class DataProcessor:
     async def _store_weather_data(self, weather_data: WeatherData):
         """Store processed weather data in database"""
         try:
-            data_dict = weather_data.dict()
+            data_dict = _weather_doc(weather_data)
             await self.weather_collection.insert_one(data_dict)
+            # New reading changes the recent window, so the next read must hit the database
+            self._hist_cache.clear()
             logger.info(f"Stored weather data with ID: {weather_data.id}")
         except Exception as e:
             logger.error(f"Error storing weather data: {str(e)}")
@@ -183,104 +283,242 @@ class DataProcessor:
         """Store detected anomalies in database"""
         try:
             if anomalies:
-                anomaly_dicts = [anomaly.dict() for anomaly in anomalies]
-                await self.anomaly_collection.insert_many(anomaly_dicts)
+                # Stored anomalies need the id and timestamp that detected ones lack
+                anomaly_dicts = [_bson_doc(Anomaly.model_construct(**anomaly.__dict__)) for anomaly in anomalies]
+                for i in range(0, len(anomaly_dicts), MAX_INSERT_BATCH):
+                    await self.anomaly_collection.insert_many(anomaly_dicts[i:i + MAX_INSERT_BATCH], ordered=False)
                 logger.info(f"Stored {len(anomalies)} anomalies")
         except Exception as e:
             logger.error(f"Error storing anomalies: {str(e)}")
             raise
     
+    async def _refresh_daily_stats(self, date) -> bool:
+        """
+        Materialize daily stats every DAILY_STATS_REFRESH_CYCLES cycles, and right away when the day changes
+        Returns whether a refresh ran
+        """
+        self._stats_pending_dates.add(date)
+        self._cycles_since_stats += 1
+        if self._cycles_since_stats < DAILY_STATS_REFRESH_CYCLES and len(self._stats_pending_dates) == 1:
+            return False
+        
+        dates, self._stats_pending_dates = self._stats_pending_dates, set()
+        self._cycles_since_stats = 0
+        for pending_date in sorted(dates):
+            await self._update_daily_stats(pending_date)
+        return True
+    
     async def _update_daily_stats(self, date):
-        """Update daily statistics for the given date"""
+        """Recompute daily statistics for the given date, server-side where the database supports it"""
         try:
             date_str = date.strftime("%Y-%m-%d")
             start_date = datetime.combine(date, datetime.min.time())
-            end_date = start_date + timedelta(days=1)
-            
-            # Get all data for the day
-            pipeline = [
-                {"$match": {"timestamp": {"$gte": start_date, "$lt": end_date}}},
-                {"$group": {
-                    "_id": None,
-                    "avgTemperature": {"$avg": "$temperature"},
-                    "minTemperature": {"$min": "$temperature"},
-                    "maxTemperature": {"$max": "$temperature"},
-                    "avgHumidity": {"$avg": "$humidity"},
-                    "avgAirQuality": {"$avg": "$air_quality"},
-                    "avgPressure": {"$avg": "$pressure"},
-                    "dataPointsCount": {"$sum": 1}
-                }}
-            ]
-            
-            result = await self.weather_collection.aggregate(pipeline).to_list(1)
+            day_range = {"timestamp": {"$gte": start_date, "$lt": start_date + timedelta(days=1)}}
             
-            if result:
-                stats_data = result[0]
-                
-                # Count anomalies for the day
-                anomaly_count = await self.anomaly_collection.count_documents({
-                    "timestamp": {"$gte": start_date, "$lt": end_date}
-                })
-                
-                daily_stats = DailyStats(
-                    date=date_str,
-                    avgTemperature=round(stats_data["avgTemperature"], 1),
-                    minTemperature=round(stats_data["minTemperature"], 1),
-                    maxTemperature=round(stats_data["maxTemperature"], 1),
-                    avgHumidity=round(stats_data["avgHumidity"], 1),
-                    avgAirQuality=round(stats_data["avgAirQuality"], 1),
-                    avgPressure=round(stats_data["avgPressure"], 1),
-                    dataPointsCount=stats_data["dataPointsCount"],
-                    anomaliesCount=anomaly_count
-                )
-                
-                # Upsert daily stats
-                await self.daily_stats_collection.replace_one(
-                    {"date": date_str},
-                    daily_stats.dict(),
-                    upsert=True
-                )
-                
-                logger.info(f"Updated daily stats for {date_str}")
+            try:
+                await self._merge_daily_stats(date_str, day_range)
+            except OperationFailure as e:
+                # $merge and $lookup sub-pipelines need MongoDB 4.2+
+                logger.warning(f"Daily stats $merge failed, falling back to upsert: {str(e)}")
+                await self._upsert_daily_stats(date_str, day_range)
+            logger.info(f"Updated daily stats for {date_str}")
                 
         except Exception as e:
             logger.error(f"Error updating daily stats: {str(e)}")
     
+    async def _merge_daily_stats(self, date_str: str, day_range: Dict[str, Any]):
+        """Aggregate the day's readings, count its anomalies and upsert the result in one round trip"""
+        pipeline = [
+            {"$match": day_range},
+            {"$project": {"_id": 0, "temperature": 1, "humidity": 1, "air_quality": 1, "pressure": 1}},
+            {"$group": {
+                "_id": None,
+                "avg_temperature": {"$avg": "$temperature"},
+                "min_temperature": {"$min": "$temperature"},
+                "max_temperature": {"$max": "$temperature"},
+                "avg_humidity": {"$avg": "$humidity"},
+                "avg_air_quality": {"$avg": "$air_quality"},
+                "avg_pressure": {"$avg": "$pressure"},
+                "data_points_count": {"$sum": 1}
+            }},
+            {"$lookup": {
+                "from": self.anomaly_collection.name,
+                "pipeline": [{"$match": day_range}, {"$count": "n"}],
+                "as": "anomalies"
+            }},
+            # Same document shape as DailyStats
+            {"$project": {
+                "_id": 0,
+                "id": {"$literal": str(uuid.uuid4())},
+                "date": {"$literal": date_str},
+                "avg_temperature": {"$round": ["$avg_temperature", 1]},
+                "min_temperature": {"$round": ["$min_temperature", 1]},
+                "max_temperature": {"$round": ["$max_temperature", 1]},
+                "avg_humidity": {"$round": ["$avg_humidity", 1]},
+                "avg_air_quality": {"$round": ["$avg_air_quality", 1]},
+                "avg_pressure": {"$round": ["$avg_pressure", 1]},
+                "data_points_count": 1,
+                "anomalies_count": {"$ifNull": [{"$arrayElemAt": ["$anomalies.n", 0]}, 0]},
+                "created_at": {"$literal": datetime.utcnow()}
+            }},
+            {"$merge": {
+                "into": self.daily_stats_collection.name,
+                "on": "date",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }}
+        ]
+        
+        await self.weather_collection.aggregate(pipeline, allowDiskUse=False).to_list(None)
+    
+    async def _upsert_daily_stats(self, date_str: str, day_range: Dict[str, Any]):
+        """Client-side equivalent of _merge_daily_stats for servers without $merge"""
+        pipeline = [
+            {"$match": day_range},
+            {"$project": {"_id": 0, "temperature": 1, "humidity": 1, "air_quality": 1, "pressure": 1}},
+            {"$group": {
+                "_id": None,
+                "avgTemperature": {"$avg": "$temperature"},
+                "minTemperature": {"$min": "$temperature"},
+                "maxTemperature": {"$max": "$temperature"},
+                "avgHumidity": {"$avg": "$humidity"},
+                "avgAirQuality": {"$avg": "$air_quality"},
+                "avgPressure": {"$avg": "$pressure"},
+                "dataPointsCount": {"$sum": 1}
+            }}
+        ]
+        
+        # Aggregate the day's readings and count its anomalies concurrently
+        result, anomaly_count = await asyncio.gather(
+            self.weather_collection.aggregate(pipeline, allowDiskUse=False).to_list(1),
+            self.anomaly_collection.count_documents(day_range)
+        )
+        if not result:
+            return
+        
+        stats_data = result[0]
+        daily_stats = DailyStats(
+            date=date_str,
+            avgTemperature=round(stats_data["avgTemperature"], 1),
+            minTemperature=round(stats_data["minTemperature"], 1),
+            maxTemperature=round(stats_data["maxTemperature"], 1),
+            avgHumidity=round(stats_data["avgHumidity"], 1),
+            avgAirQuality=round(stats_data["avgAirQuality"], 1),
+            avgPressure=round(stats_data["avgPressure"], 1),
+            dataPointsCount=stats_data["dataPointsCount"],
+            anomaliesCount=anomaly_count
+        )
+        await self.daily_stats_collection.replace_one({"date": date_str}, daily_stats.model_dump(), upsert=True)
+    
     async def _log_action(self, action: str, status: LogStatus, details: str, duration_ms: Optional[int] = None, data_count: Optional[int] = None):
-        """Log processing action"""
+        """Log processing action; entries are buffered and written in batches"""
         try:
-            log_entry = ProcessingLogCreate(
-                action=action,
-                status=status,
-                details=details,
-                durationMs=duration_ms,
-                dataCount=data_count
-            )
-            
-            log_dict = ProcessingLog(**log_entry.dict()).dict()
-            await self.logs_collection.insert_one(log_dict)
+            # Stored ProcessingLog shape, built directly: all inputs come from this module
+            log_dict = {
+                "id": str(uuid.uuid4()),
+                "timestamp": datetime.utcnow(),
+                "action": action,
+                "status": status.value,
+                "details": details,
+                "duration_ms": duration_ms,
+                "data_count": data_count
+            }
+            self._log_buffer.append(log_dict)
+            if len(self._log_buffer) >= LOG_FLUSH_SIZE:
+                self._schedule_log_flush()
             
         except Exception as e:
             logger.error(f"Error logging action: {str(e)}")
     
+    def _schedule_log_flush(self):
+        """Flush buffered logs in the background, off the caller's critical path"""
+        if not self._log_buffer:
+            return
+        task = asyncio.create_task(self._flush_logs())
+        self._log_flush_tasks.add(task)
+        task.add_done_callback(self._log_flush_tasks.discard)
+    
+    async def _flush_logs(self):
+        """Write all buffered log entries in as few round trips as possible"""
+        async with self._log_lock:
+            log_docs, self._log_buffer = self._log_buffer, []
+            try:
+                for i in range(0, len(log_docs), MAX_INSERT_BATCH):
+                    await self.logs_write_collection.insert_many(log_docs[i:i + MAX_INSERT_BATCH], ordered=False)
+            except Exception as e:
+                logger.error(f"Error logging actions: {str(e)}")
+    
+    async def _periodic_log_flush(self):
+        while True:
+            await asyncio.sleep(LOG_FLUSH_INTERVAL)
+            await self._flush_logs()
+    
+    def start_log_flusher(self):
+        """Start the periodic log flush; call from within the running event loop"""
+        if self._log_flusher is None or self._log_flusher.done():
+            self._log_flusher = asyncio.create_task(self._periodic_log_flush())
+    
+    async def stop_log_flusher(self):
+        """Stop the periodic log flush and write whatever is still buffered"""
+        if self._log_flusher is not None:
+            self._log_flusher.cancel()
+            self._log_flusher = None
+        await self._flush_logs()
+    
     async def export_to_csv(self, data_type: str, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> str:
         """Export data to CSV format"""
+        return b"".join([chunk async for chunk in self.iter_csv(data_type, start_date, end_date)]).decode("utf-8")
+    
+    async def iter_csv(self, data_type: str, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> AsyncIterator[bytes]:
+        """
+        Stream data as UTF-8 encoded CSV chunks straight from the database cursor
+        Yields nothing when no records match, so callers can detect empty exports
+        """
         try:
             if data_type == "hourly":
-                return await self._export_hourly_data_csv(start_date, end_date)
+                cursor = self.weather_collection.find(self._timestamp_query(start_date, end_date), self.HOURLY_CSV_PROJECTION).sort("timestamp", -1).limit(1000)
+                header, make_row = self.HOURLY_CSV_HEADER, self._hourly_csv_row
             elif data_type == "daily":
-                return await self._export_daily_data_csv(start_date, end_date)
+                cursor = self.daily_stats_collection.find(self._date_query(start_date, end_date), self.DAILY_CSV_PROJECTION).sort("date", -1).limit(100)
+                header, make_row = self.DAILY_CSV_HEADER, self._daily_csv_row
             elif data_type == "anomalies":
-                return await self._export_anomalies_csv(start_date, end_date)
+                cursor = self.anomaly_collection.find(self._timestamp_query(start_date, end_date), self.ANOMALIES_CSV_PROJECTION).sort("timestamp", -1).limit(500)
+                header, make_row = self.ANOMALIES_CSV_HEADER, self._anomaly_csv_row
             else:
                 raise ValueError(f"Unknown data type: {data_type}")
+            
+            # Rows are encoded into one reused byte buffer, drained every batch,
+            # so chunks go out as bytes without a separate str -> bytes copy
+            output = io.BytesIO()
+            text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+            writer = csv.writer(text)
+            rows_in_buffer = 0
+            
+            async for item in cursor.batch_size(CSV_BATCH_SIZE):
+                if header is not None:
+                    writer.writerow(header)
+                    header = None
+                
+                writer.writerow(make_row(item))
+                rows_in_buffer += 1
+                
+                if rows_in_buffer >= CSV_BATCH_SIZE:
+                    text.flush()
+                    yield output.getvalue()
+                    output.seek(0)
+                    output.truncate(0)
+                    rows_in_buffer = 0
+            
+            if rows_in_buffer:
+                text.flush()
+                yield output.getvalue()
                 
         except Exception as e:
             logger.error(f"Error exporting CSV: {str(e)}")
             raise
     
-    async def _export_hourly_data_csv(self, start_date: Optional[datetime], end_date: Optional[datetime]) -> str:
-        """Export hourly weather data to CSV"""
+    @staticmethod
+    def _timestamp_query(start_date: Optional[datetime], end_date: Optional[datetime]) -> Dict[str, Any]:
         query = {}
         if start_date or end_date:
             query["timestamp"] = {}
@@ -288,43 +526,10 @@ class DataProcessor:
                 query["timestamp"]["$gte"] = start_date
             if end_date:
                 query["timestamp"]["$lte"] = end_date
-        
-        cursor = self.weather_collection.find(query).sort("timestamp", -1).limit(1000)
-        data = await cursor.to_list(1000)
-        
-        if not data:
-            return ""
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'Час', 'Температура (°C)', 'Вологість (%)', 'Якість повітря',
-            'PM2.5 (μg/m³)', 'PM10 (μg/m³)', 'CO2 (ppm)', 'Тиск (hPa)',
-            'Швидкість вітру (м/с)', 'Напрямок вітру (°)', 'Локація'
-        ])
-        
-        # Write data
-        for item in data:
-            writer.writerow([
-                datetime.fromisoformat(item['timestamp'].replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M:%S') if isinstance(item['timestamp'], str) else item['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
-                round(item.get('temperature', 0), 1),
-                round(item.get('humidity', 0), 1),
-                item.get('air_quality', 0),
-                round(item.get('pm25', 0), 1) if item.get('pm25') else '',
-                round(item.get('pm10', 0), 1) if item.get('pm10') else '',
-                item.get('co2', '') if item.get('co2') else '',
-                round(item.get('pressure', 0), 1),
-                round(item.get('wind_speed', 0), 1),
-                item.get('wind_direction', 0),
-                item.get('location', '')
-            ])
-        
-        return output.getvalue()
+        return query
     
-    async def _export_daily_data_csv(self, start_date: Optional[datetime], end_date: Optional[datetime]) -> str:
-        """Export daily statistics to CSV"""
+    @staticmethod
+    def _date_query(start_date: Optional[datetime], end_date: Optional[datetime]) -> Dict[str, Any]:
         query = {}
         if start_date or end_date:
             date_query = {}
@@ -333,78 +538,58 @@ class DataProcessor:
             if end_date:
                 date_query["$lte"] = end_date.strftime("%Y-%m-%d")
             query["date"] = date_query
-        
-        cursor = self.daily_stats_collection.find(query).sort("date", -1).limit(100)
-        data = await cursor.to_list(100)
-        
-        if not data:
-            return ""
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'Дата', 'Середня температура (°C)', 'Мін. температура (°C)', 'Макс. температура (°C)',
-            'Середня вологість (%)', 'Середня якість повітря', 'Середній тиск (hPa)',
-            'Кількість записів', 'Кількість аномалій'
-        ])
-        
-        # Write data
-        for item in data:
-            writer.writerow([
-                item.get('date', ''),
-                round(item.get('avg_temperature', 0), 1),
-                round(item.get('min_temperature', 0), 1),
-                round(item.get('max_temperature', 0), 1),
-                round(item.get('avg_humidity', 0), 1),
-                round(item.get('avg_air_quality', 0), 1),
-                round(item.get('avg_pressure', 0), 1),
-                item.get('data_points_count', 0),
-                item.get('anomalies_count', 0)
-            ])
-        
-        return output.getvalue()
+        return query
     
-    async def _export_anomalies_csv(self, start_date: Optional[datetime], end_date: Optional[datetime]) -> str:
-        """Export anomalies to CSV"""
-        query = {}
-        if start_date or end_date:
-            query["timestamp"] = {}
-            if start_date:
-                query["timestamp"]["$gte"] = start_date
-            if end_date:
-                query["timestamp"]["$lte"] = end_date
-        
-        cursor = self.anomaly_collection.find(query).sort("timestamp", -1).limit(500)
-        data = await cursor.to_list(500)
-        
-        if not data:
-            return ""
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'ID', 'Час', 'Тип сенсора', 'Оригінальне значення', 'Відфільтроване значення',
-            'Причина', 'Статус', 'Достовірність'
-        ])
-        
-        # Write data
-        for item in data:
-            writer.writerow([
-                item.get('id', ''),
-                datetime.fromisoformat(item['timestamp'].replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M:%S') if isinstance(item['timestamp'], str) else item['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
-                item.get('sensor_type', ''),
-                item.get('original_value', ''),
-                item.get('filtered_value', '') if item.get('filtered_value') else '',
-                item.get('reason', ''),
-                item.get('status', ''),
-                round(item.get('confidence', 0), 2) if item.get('confidence') else ''
-            ])
-        
-        return output.getvalue()
+    @staticmethod
+    def _csv_timestamp(ts) -> str:
+        """Format as YYYY-MM-DD HH:MM:SS without strftime's format parser"""
+        if isinstance(ts, str):
+            # Older documents may hold the timestamp as an ISO string
+            ts = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+        return f"{ts.year:04d}-{ts.month:02d}-{ts.day:02d} {ts.hour:02d}:{ts.minute:02d}:{ts.second:02d}"
+    
+    @staticmethod
+    def _hourly_csv_row(item: Dict[str, Any]) -> List[Any]:
+        return [
+            DataProcessor._csv_timestamp(item['timestamp']),
+            round(item.get('temperature', 0), 1),
+            round(item.get('humidity', 0), 1),
+            item.get('air_quality', 0),
+            round(item.get('pm25', 0), 1) if item.get('pm25') else '',
+            round(item.get('pm10', 0), 1) if item.get('pm10') else '',
+            item.get('co2', '') if item.get('co2') else '',
+            round(item.get('pressure', 0), 1),
+            round(item.get('wind_speed', 0), 1),
+            item.get('wind_direction', 0),
+            item.get('location', '')
+        ]
+    
+    @staticmethod
+    def _daily_csv_row(item: Dict[str, Any]) -> List[Any]:
+        return [
+            item.get('date', ''),
+            round(item.get('avg_temperature', 0), 1),
+            round(item.get('min_temperature', 0), 1),
+            round(item.get('max_temperature', 0), 1),
+            round(item.get('avg_humidity', 0), 1),
+            round(item.get('avg_air_quality', 0), 1),
+            round(item.get('avg_pressure', 0), 1),
+            item.get('data_points_count', 0),
+            item.get('anomalies_count', 0)
+        ]
+    
+    @staticmethod
+    def _anomaly_csv_row(item: Dict[str, Any]) -> List[Any]:
+        return [
+            item.get('id', ''),
+            DataProcessor._csv_timestamp(item['timestamp']),
+            item.get('sensor_type', ''),
+            item.get('original_value', ''),
+            item.get('filtered_value', '') if item.get('filtered_value') else '',
+            item.get('reason', ''),
+            item.get('status', ''),
+            round(item.get('confidence', 0), 2) if item.get('confidence') else ''
+        ]
 
 # Global instance will be created in server.py
 data_processor = None
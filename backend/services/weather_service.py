@@ -1,18 +1,44 @@
 import aiohttp
+import orjson
 import os
 import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 import asyncio
+import random
+import time
 from pathlib import Path
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Transient failures are retried with jittered exponential backoff
+API_MAX_ATTEMPTS = 3
+API_RETRY_BASE_DELAY = 0.2  # seconds, doubled per attempt
+API_RETRY_MAX_DELAY = 2.0  # seconds
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# After retries are exhausted, calls are skipped for this long
+CIRCUIT_OPEN_SECONDS = 60
+
 class WeatherAPIService:
+    # Piecewise-linear AQI segments per pollutant: lower breakpoint, AQI at that breakpoint,
+    # and the segment's AQI rise over concentration run. The last segment extends upwards.
+    _PM25_BP = np.array([0.0, 12.0, 35.4])
+    _PM25_BASE = np.array([0.0, 50.0, 100.0])
+    _PM25_RISE = np.array([50.0, 50.0, 100.0])
+    _PM25_RUN = np.array([12.0, 23.4, 55.4])
+    
+    _PM10_BP = np.array([0.0, 54.0, 154.0])
+    _PM10_BASE = np.array([0.0, 50.0, 100.0])
+    _PM10_RISE = np.array([50.0, 50.0, 100.0])
+    _PM10_RUN = np.array([54.0, 100.0, 250.0])
+    
     def __init__(self):
         self.api_key = os.environ.get('WEATHER_API_KEY')
         self.base_url = os.environ.get('WEATHER_API_URL', 'http://api.weatherapi.com/v1')
         self.session = None
+        self._circuit_open_until = 0.0
         
         # Debug environment variables
         logger.info(f"WeatherAPI initialized with key: {'*' * 10 if self.api_key else 'None'}")
@@ -36,19 +62,72 @@ class WeatherAPIService:
     
     async def _get_session(self):
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+            # One pooled connection set reused across calls, with cached DNS lookups
+            connector = aiohttp.TCPConnector(
+                limit=32,
+                limit_per_host=8,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=10, connect=3),
+                headers={'Accept-Encoding': 'gzip'}
+            )
         return self.session
     
     async def close(self):
         if self.session and not self.session.closed:
             await self.session.close()
     
-    async def get_current_weather(self, location: str = "Kyiv") -> Optional[Dict[str, Any]]:
+    async def _request_json(self, url: str, params: Dict[str, Any], probe: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        GET a Weather API endpoint, retrying transient errors
+        Returns None on a non-retryable error, after the last attempt, or while the circuit is open
+        Probes (health checks) make a single attempt and neither read nor trip the circuit,
+        which only guards data collection
+        """
+        if not probe and time.monotonic() < self._circuit_open_until:
+            logger.warning("Weather API circuit open, skipping request")
+            return None
+        
+        max_attempts = 1 if probe else API_MAX_ATTEMPTS
+        session = await self._get_session()
+        for attempt in range(1, max_attempts + 1):
+            try:
+                async with session.get(url, params=params) as response:
+                    if response.status == 200:
+                        data = orjson.loads(await response.read())
+                        if not probe:
+                            self._circuit_open_until = 0.0
+                        return data
+                    
+                    error_text = await response.text()
+                    logger.error(f"Weather API error {response.status}: {error_text}")
+                    if response.status not in RETRYABLE_STATUSES:
+                        return None
+                        
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Weather API request failed (attempt {attempt}/{max_attempts}): {str(e)}")
+            
+            if attempt < max_attempts:
+                delay = min(API_RETRY_MAX_DELAY, API_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+        
+        if probe:
+            return None
+        
+        self._circuit_open_until = time.monotonic() + CIRCUIT_OPEN_SECONDS
+        logger.error(f"Weather API unavailable after {API_MAX_ATTEMPTS} attempts, pausing calls for {CIRCUIT_OPEN_SECONDS}s")
+        return None
+    
+    async def get_current_weather(self, location: str = "Kyiv", probe: bool = False) -> Optional[Dict[str, Any]]:
         """
         Get current weather data from WeatherAPI
+        With probe=True (health checks) the request is tried once and bypasses the circuit breaker
         """
         try:
-            session = await self._get_session()
             url = f"{self.base_url}/current.json"
             params = {
                 'key': self.api_key,
@@ -58,16 +137,13 @@ class WeatherAPIService:
             
             logger.info(f"Making request to WeatherAPI: {url} with params: {params}")
             
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    logger.info("Successfully received weather data from API")
-                    return self._transform_current_data(data)
-                else:
-                    error_text = await response.text()
-                    logger.error(f"Weather API error {response.status}: {error_text}")
-                    return None
-                    
+            data = await self._request_json(url, params, probe=probe)
+            if data is None:
+                return None
+            
+            logger.info("Successfully received weather data from API")
+            return self._transform_current_data(data)
+            
         except Exception as e:
             logger.error(f"Error fetching current weather: {str(e)}")
             return None
@@ -77,7 +153,6 @@ class WeatherAPIService:
         Get historical weather data for a specific date
         """
         try:
-            session = await self._get_session()
             url = f"{self.base_url}/history.json"
             params = {
                 'key': self.api_key,
@@ -86,15 +161,12 @@ class WeatherAPIService:
                 'aqi': 'yes'
             }
             
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return self._transform_historical_data(data)
-                else:
-                    error_text = await response.text()
-                    logger.error(f"Weather API error {response.status}: {error_text}")
-                    return None
-                    
+            data = await self._request_json(url, params)
+            if data is None:
+                return None
+            
+            return self._transform_historical_data(data)
+            
         except Exception as e:
             logger.error(f"Error fetching historical weather: {str(e)}")
             return None
@@ -193,26 +265,10 @@ class WeatherAPIService:
             so2 = air_quality.get('so2', 0)
             co = air_quality.get('co', 0)
             
-            # Simple AQI calculation (this is a basic approximation)
-            aqi = 0
-            
-            # PM2.5 contribution (0-500 scale)
-            if pm25 <= 12:
-                aqi = max(aqi, int(pm25 * 50 / 12))
-            elif pm25 <= 35.4:
-                aqi = max(aqi, int(50 + (pm25 - 12) * 50 / 23.4))
-            else:
-                aqi = max(aqi, min(500, int(100 + (pm25 - 35.4) * 100 / 55.4)))
-            
-            # PM10 contribution
-            if pm10 <= 54:
-                pm10_aqi = int(pm10 * 50 / 54)
-            elif pm10 <= 154:
-                pm10_aqi = int(50 + (pm10 - 54) * 50 / 100)
-            else:
-                pm10_aqi = min(500, int(100 + (pm10 - 154) * 100 / 250))
-            
-            aqi = max(aqi, pm10_aqi)
+            # Simple AQI calculation (this is a basic approximation), 0-500 scale
+            pm25_aqi = int(self._piecewise_aqi(pm25, self._PM25_BP, self._PM25_BASE, self._PM25_RISE, self._PM25_RUN))
+            pm10_aqi = int(self._piecewise_aqi(pm10, self._PM10_BP, self._PM10_BASE, self._PM10_RISE, self._PM10_RUN))
+            aqi = max(pm25_aqi, pm10_aqi)
             
             # Ensure AQI is within reasonable bounds
             return max(1, min(500, aqi)) if aqi > 0 else 25  # Default to 25 if no data
@@ -220,6 +276,14 @@ class WeatherAPIService:
         except Exception as e:
             logger.error(f"Error calculating AQI: {str(e)}")
             return 50  # Default moderate value
+    
+    @staticmethod
+    def _piecewise_aqi(values, bp: np.ndarray, base: np.ndarray, rise: np.ndarray, run: np.ndarray) -> np.ndarray:
+        """Interpolate AQI for a concentration via breakpoint lookup"""
+        values = np.asarray(values, dtype=np.float64)
+        # Segment i covers (bp[i], bp[i+1]]; values below the table use the first segment
+        i = np.clip(np.searchsorted(bp, values, side='left') - 1, 0, len(bp) - 1)
+        return base[i] + (values - bp[i]) * rise[i] / run[i]
 
 # Global instance
 weather_service = WeatherAPIService()
@@ -0,0 +1,21 @@
+"""
+Build the optional compiled kernels used by the backend services
+Usage: pip install -r requirements-build.txt && python setup.py build_ext --inplace
+"""
+from setuptools import Extension, setup
+from Cython.Build import cythonize
+
+setup(
+    name="air-quality-monitor-kernels",
+    packages=[],
+    ext_modules=cythonize(
+        [Extension("services._anomaly_fast", ["services/_anomaly_fast.pyx"])],
+        compiler_directives={
+            "language_level": 3,
+            "boundscheck": False,
+            "wraparound": False,
+            "cdivision": True
+        }
+    ),
+    zip_safe=False
+)
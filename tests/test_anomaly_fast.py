@@ -0,0 +1,67 @@
+"""
+Compiled column_stats kernel versus the NumPy fallback in anomaly_detector
+Build the kernel first (backend/setup.py); otherwise these tests are skipped
+"""
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from services.anomaly_detector import _column_stats_numpy, SENSOR_ORDER
+
+try:
+    from services import _anomaly_fast
+except ImportError:
+    _anomaly_fast = None
+
+
+@unittest.skipIf(_anomaly_fast is None, "services._anomaly_fast is not built")
+class ColumnStatsParityTest(unittest.TestCase):
+
+    def assertStatsAgree(self, values):
+        """Kernel and fallback give the same means, standard deviations and counts, NaN included"""
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        fast_means, fast_stds, fast_counts = _anomaly_fast.column_stats(values)
+        means, stds, counts = _column_stats_numpy(values)
+
+        np.testing.assert_array_equal(fast_counts, counts)
+        np.testing.assert_allclose(fast_means, means, rtol=1e-12, atol=1e-9, equal_nan=True)
+        np.testing.assert_allclose(fast_stds, stds, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+    def test_history_matrix(self):
+        """A full 100-reading history window with realistic sensor magnitudes"""
+        rng = np.random.default_rng(0)
+        scale = np.array([20.0, 60.0, 50.0, 1013.0, 15.0, 25.0, 400.0])
+        values = scale + rng.normal(size=(100, len(SENSOR_ORDER))) * scale * 0.1
+        self.assertStatsAgree(values)
+
+    def test_missing_readings(self):
+        """NaN gaps are skipped per column, including a column with no readings at all"""
+        rng = np.random.default_rng(1)
+        values = 20.0 + rng.normal(size=(40, len(SENSOR_ORDER)))
+        values[rng.random(values.shape) < 0.3] = np.nan
+        values[:, 4] = np.nan
+        self.assertStatsAgree(values)
+
+    def test_fewer_than_ten_samples(self):
+        """Short windows, down to one and zero valid readings per column"""
+        rng = np.random.default_rng(2)
+        for rows in (0, 1, 2, 9):
+            with self.subTest(rows=rows):
+                values = 1013.0 + rng.normal(size=(rows, len(SENSOR_ORDER)))
+                if rows > 1:
+                    values[0, ::2] = np.nan
+                self.assertStatsAgree(values)
+
+    def test_constant_column(self):
+        """Identical readings give zero spread in both implementations"""
+        values = np.full((12, len(SENSOR_ORDER)), 55.5)
+        values[3, 1] = np.nan
+        self.assertStatsAgree(values)
+
+
+if __name__ == "__main__":
+    unittest.main()
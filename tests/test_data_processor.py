@@ -0,0 +1,139 @@
+"""
+DataProcessor storage tests against a real MongoDB
+Set MONGO_URL (MongoDB 4.2+) to run them; each test uses its own throwaway database
+"""
+import asyncio
+import os
+import sys
+import unittest
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from models import Anomaly, LogStatus, WeatherData
+from services.data_processor import DataProcessor
+
+MONGO_URL = os.environ.get("MONGO_URL")
+
+STATS_DAY = date(2024, 5, 10)
+
+# Daily stats for STATS_DAY after _seed_day; values avoid rounding ties
+EXPECTED_DAILY_STATS = {
+    "date": "2024-05-10",
+    "avg_temperature": 20.2,
+    "min_temperature": 19.5,
+    "max_temperature": 21.1,
+    "avg_humidity": 55.3,
+    "avg_air_quality": 43.3,
+    "avg_pressure": 1012.3,
+    "data_points_count": 3,
+    "anomalies_count": 2
+}
+
+# Written per document but not comparable between two refreshes
+_VOLATILE_STATS_FIELDS = ("_id", "id", "created_at")
+
+
+@unittest.skipUnless(MONGO_URL, "MONGO_URL not set")
+class DataProcessorMongoTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Skip rather than fail when MONGO_URL points at a server that is not running"""
+        client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+        try:
+            client.admin.command("ping")
+        except PyMongoError as e:
+            raise unittest.SkipTest(f"MongoDB not reachable at {MONGO_URL}: {e}")
+        finally:
+            client.close()
+
+    def _run(self, test):
+        """Run an async test body with a DataProcessor over a fresh database, dropped afterwards"""
+        async def go():
+            client = AsyncIOMotorClient(MONGO_URL)
+            db = client[f"test_data_processor_{uuid.uuid4().hex[:12]}"]
+            try:
+                await test(DataProcessor(db), db)
+            finally:
+                await client.drop_database(db.name)
+                client.close()
+        asyncio.run(go())
+
+    def test_flush_logs_persists_entries(self):
+        """Buffered processing logs must actually land in processing_logs"""
+        async def test(processor, db):
+            await processor._log_action("Перша дія", LogStatus.SUCCESS, "details 1")
+            await processor._log_action("Друга дія", LogStatus.ERROR, "details 2", duration_ms=5, data_count=1)
+            await processor._flush_logs()
+
+            logs = await db.processing_logs.find({}, {"_id": 0}).sort("action", -1).to_list(None)
+            self.assertEqual([log["action"] for log in logs], ["Перша дія", "Друга дія"])
+            self.assertEqual([log["status"] for log in logs], ["success", "error"])
+            self.assertEqual(logs[1]["duration_ms"], 5)
+            self.assertEqual(processor._log_buffer, [])
+
+        self._run(test)
+
+    async def _seed_day(self, processor, db):
+        """Three readings and two anomalies on STATS_DAY, one of each on the day before"""
+        await db.daily_stats.create_index("date", unique=True)
+        start = datetime.combine(STATS_DAY, datetime.min.time())
+        readings = [
+            (start + timedelta(hours=1), 20.04, 50.0, 40, 1010.2),
+            (start + timedelta(hours=9), 21.13, 55.0, 43, 1012.7),
+            (start + timedelta(hours=23, minutes=59), 19.52, 61.0, 47, 1013.9),
+            (start - timedelta(minutes=1), 35.0, 90.0, 300, 990.0)
+        ]
+        for timestamp, temperature, humidity, air_quality, pressure in readings:
+            await processor._store_weather_data(WeatherData(
+                timestamp=timestamp, temperature=temperature, humidity=humidity, airQuality=air_quality,
+                pressure=pressure, windSpeed=1.0, windDirection=90, location="Kyiv, Ukraine"
+            ))
+        await processor._store_anomalies([
+            Anomaly(timestamp=timestamp, sensorType="temperature", originalValue=99.0, reason="test", status="detected")
+            for timestamp in (start + timedelta(hours=2), start + timedelta(hours=12), start - timedelta(hours=1))
+        ])
+
+    async def _stored_daily_stats(self, db):
+        docs = await db.daily_stats.find({}).to_list(None)
+        self.assertEqual(len(docs), 1, "Exactly one daily stats document per date")
+        return {k: v for k, v in docs[0].items() if k not in _VOLATILE_STATS_FIELDS}
+
+    def test_merge_daily_stats_matches_upsert(self):
+        """The server-side $merge pipeline stores the same document as the client-side upsert"""
+        async def test(processor, db):
+            await self._seed_day(processor, db)
+            start = datetime.combine(STATS_DAY, datetime.min.time())
+            day_range = {"timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}}
+
+            await processor._merge_daily_stats("2024-05-10", day_range)
+            merged = await self._stored_daily_stats(db)
+
+            await db.daily_stats.delete_many({})
+            await processor._upsert_daily_stats("2024-05-10", day_range)
+            upserted = await self._stored_daily_stats(db)
+
+            self.assertEqual(merged, EXPECTED_DAILY_STATS)
+            self.assertEqual(merged, upserted)
+
+        self._run(test)
+
+    def test_update_daily_stats_replaces_existing_document(self):
+        """Refreshing a date again replaces its document instead of adding another"""
+        async def test(processor, db):
+            await self._seed_day(processor, db)
+            await processor._update_daily_stats(STATS_DAY)
+            await processor._update_daily_stats(STATS_DAY)
+            self.assertEqual(await self._stored_daily_stats(db), EXPECTED_DAILY_STATS)
+
+        self._run(test)
+
+
+if __name__ == "__main__":
+    unittest.main()